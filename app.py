@@ -1,11 +1,23 @@
+"""
+AWS IAM Policy Generator - Gradio web application
+
+Environment variables:
+  AWS_REGION            AWS region where Bedrock is available (default: us-east-1)
+  BEDROCK_LATENCY_MODE  "standard" (default) or "optimized" Bedrock inference latency;
+                        falls back to "standard" if the model/region rejects it
+  GRADIO_SHARE          "true" to create a public gradio.live share link (default: false,
+                        which avoids routing every request through the relay)
+  GRADIO_SERVER_NAME    Interface to listen on (default: 0.0.0.0)
+"""
+
 import os
-import json
+import asyncio
 import gradio as gr
-import boto3
-import re
 from dotenv import load_dotenv
 from policy_validator import PolicyValidator
 from policy_utils import PolicyUtils
+from policy_extract import extract_policy
+from bedrock_core import get_bedrock_session, stream_iam_policy
 
 # Load environment variables
 load_dotenv()
@@ -14,98 +26,8 @@ load_dotenv()
 policy_validator = PolicyValidator()
 policy_utils = PolicyUtils()
 
-# Initialize Bedrock client
-def get_bedrock_client():
-    return boto3.client(
-        service_name="bedrock-runtime",
-        region_name=os.environ.get("AWS_REGION", "us-east-1"),
-        aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY")
-    )
-
-# Model ID for Claude 3.5 Sonnet
-MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
-
-# Function to generate IAM policy using Claude
-def generate_iam_policy(prompt, client):
-    system_prompt = """
-    You are an AWS IAM policy expert assistant. Your task is to generate minimum viable permission (MVP) 
-    IAM policies based on the user's description of their AWS use case.
-    
-    Follow these guidelines:
-    1. Analyze the user's request carefully to understand their specific AWS use case
-    2. Generate the most restrictive IAM policy that still allows all necessary operations
-    3. Follow the principle of least privilege
-    4. Include only the permissions that are absolutely necessary
-    5. Use resource-level restrictions whenever possible
-    6. Provide clear explanations for why each permission is included
-    7. Format the policy according to AWS IAM JSON syntax
-    8. Highlight any potential security concerns or recommendations
-    
-    Your response should include:
-    1. A summary of your understanding of the use case
-    2. The complete IAM policy in JSON format (enclosed in ```json and ``` markers)
-    3. A detailed explanation of each permission and why it's necessary
-    4. Any security recommendations or best practices relevant to this use case
-    
-    IMPORTANT: Always format the policy JSON with proper indentation and enclose it in ```json and ``` markers
-    to make it easy to extract.
-    """
-    
-    try:
-        response = client.invoke_model(
-            modelId=MODEL_ID,
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 4096,
-                "system": system_prompt,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            })
-        )
-        
-        response_body = json.loads(response.get('body').read().decode('utf-8'))
-        return response_body['content'][0]['text']
-    except Exception as e:
-        return f"Error generating IAM policy: {str(e)}"
-
-# Extract policy JSON from text
-def extract_policy_json(text):
-    try:
-        # Look for JSON content between triple backticks
-        json_pattern = r"```json\s*([\s\S]*?)\s*```"
-        match = re.search(json_pattern, text)
-        
-        if match:
-            json_str = match.group(1).strip()
-            # Validate it's proper JSON
-            policy = json.loads(json_str)
-            return json_str, policy
-        
-        # Alternative: look for content that looks like JSON
-        json_pattern = r"\{\s*\"Version\"[\s\S]*?\"Statement\"[\s\S]*?\}"
-        match = re.search(json_pattern, text)
-        
-        if match:
-            json_str = match.group(0).strip()
-            # Validate it's proper JSON
-            policy = json.loads(json_str)
-            return json_str, policy
-                
-        return None, None
-    except:
-        return None, None
-
-# Validate policy and format results
-def validate_policy_from_text(text):
-    json_str, policy = extract_policy_json(text)
-    
+# Validate an extracted policy and format results
+def validate_policy_from_dict(policy):
     if not policy:
         return "No valid policy found in the response."
     
@@ -133,52 +55,58 @@ def validate_policy_from_text(text):
     
     return result
 
-# Save policy to file
-def save_policy_from_text(text, policy_name=None):
-    success, result = policy_utils.extract_and_save_policy(text, policy_name)
+# Extract the policy from a response and validate it
+def extract_and_validate_policy(text):
+    json_str, policy = extract_policy(text)
+    return json_str, policy, validate_policy_from_dict(policy)
+
+# Save an extracted policy to file
+def save_policy_from_dict(policy, policy_name=None):
+    filepath = policy_utils.save_policy(policy, policy_name)
     
-    if success:
-        return f"✅ Policy saved successfully to: {result}"
+    if filepath:
+        return f"✅ Policy saved successfully to: {filepath}"
     else:
-        return f"❌ Failed to save policy: {result}"
+        return "❌ Failed to save policy."
 
 # Chat history and state management
 def add_text(history, text):
     history = history + [(text, None)]
     return history, ""
 
-def bot_response(history, client_state):
+async def bot_response(history):
     if not history:
-        return history, client_state, None, None
+        yield history, None, None, None
+        return
     
     user_message = history[-1][0]
     
-    # Get or create Bedrock client
-    if client_state is None:
-        try:
-            client_state = get_bedrock_client()
-        except Exception as e:
-            history[-1][1] = f"Error connecting to AWS Bedrock: {str(e)}"
-            return history, client_state, None, None
-    
-    # Generate response
-    response = generate_iam_policy(user_message, client_state)
-    history[-1][1] = response
-    
-    # Extract and validate policy
-    validation_result = validate_policy_from_text(response)
-    
-    # Extract policy JSON for display
-    json_str, _ = extract_policy_json(response)
+    # Get the shared Bedrock session
+    try:
+        session = get_bedrock_session()
+    except Exception as e:
+        history[-1][1] = f"Error connecting to AWS Bedrock: {str(e)}"
+        yield history, None, None, None
+        return
+    
+    # Stream the response into the chat
+    response = ""
+    async for response in stream_iam_policy(user_message, session):
+        history[-1][1] = response
+        yield history, None, None, None
+    
+    # Extract the policy once (sharing the parsed dict with validation and saving)
+    # in a worker thread, so the event loop keeps serving other users meanwhile
+    json_str, policy, validation_result = await asyncio.to_thread(extract_and_validate_policy, response)
     policy_json = json_str if json_str else "No valid policy JSON found in the response."
     
-    return history, client_state, validation_result, policy_json
+    yield history, validation_result, policy_json, policy
 
-def save_current_policy(policy_json, policy_name):
-    if not policy_json or policy_json == "No valid policy JSON found in the response.":
+def save_current_policy(policy, policy_name):
+    if not policy:
         return "No valid policy to save."
     
-    return save_policy_from_text(policy_json, policy_name)
+    return save_policy_from_dict(policy, policy_name)
 
 # List saved policies
 def list_policies():
@@ -201,8 +129,7 @@ with gr.Blocks(title="AWS IAM Policy Generator") as demo:
     """)
     
     # Store states
-    client_state = gr.State(None)
-    current_policy_json = gr.State(None)
+    current_policy = gr.State(None)
     
     with gr.Tabs() as tabs:
         with gr.TabItem("Generate Policy"):
@@ -253,12 +180,12 @@ with gr.Blocks(title="AWS IAM Policy Generator") as demo:
     
     # Event handlers
     txt.submit(add_text, [chatbot, txt], [chatbot, txt]).then(
-        bot_response, [chatbot, client_state], [chatbot, client_state, validation_output, policy_json_output]
+        bot_response, [chatbot], [chatbot, validation_output, policy_json_output, current_policy]
     )
     submit_btn.click(add_text, [chatbot, txt], [chatbot, txt]).then(
-        bot_response, [chatbot, client_state], [chatbot, client_state, validation_output, policy_json_output]
+        bot_response, [chatbot], [chatbot, validation_output, policy_json_output, current_policy]
     )
-    save_btn.click(save_current_policy, [policy_json_output, policy_name_input], save_result)
+    save_btn.click(save_current_policy, [current_policy, policy_name_input], save_result)
     refresh_btn.click(list_policies, [], saved_policies_output)
     
     gr.Markdown("""
@@ -270,4 +197,7 @@ with gr.Blocks(title="AWS IAM Policy Generator") as demo:
     """)
 
 if __name__ == "__main__":
-    demo.launch(share=True)
+    demo.launch(
+        share=os.environ.get("GRADIO_SHARE", "false").lower() == "true",
+        server_name=os.environ.get("GRADIO_SERVER_NAME", "0.0.0.0")
+    )
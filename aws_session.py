@@ -0,0 +1,45 @@
+"""
+Shared boto3 sessions for the app and command-line tools.
+
+boto3 sessions are not thread-safe, so each thread gets its own session,
+created on first use and reused for every client it builds afterwards.
+Credentials and endpoint data are therefore resolved once per thread rather
+than once per client.
+"""
+
+import threading
+import boto3
+from botocore.config import Config
+
+# Connection pool and retry settings applied to every client
+DEFAULT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"mode": "adaptive"}
+)
+
+_local = threading.local()
+
+def get_session():
+    """Return the calling thread's boto3 session, creating it on first use"""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = boto3.session.Session()
+    return session
+
+def client(service, config=None, **kwargs):
+    """
+    Create a client from the calling thread's session.
+    
+    Args:
+        service (str): AWS service name, e.g. "bedrock-runtime"
+        config (Config): Settings merged over DEFAULT_CONFIG
+        **kwargs: Passed through to Session.client (region_name, ...)
+        
+    Returns:
+        A boto3 client for the service
+    """
+    if config is not None:
+        config = DEFAULT_CONFIG.merge(config)
+    else:
+        config = DEFAULT_CONFIG
+    return get_session().client(service, config=config, **kwargs)
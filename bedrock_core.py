@@ -0,0 +1,147 @@
+"""
+Bedrock access for the IAM policy generator.
+
+Holds the model settings, system prompt and Bedrock calls shared by the
+Gradio app (async, streaming) and the command-line tools (sync).
+"""
+
+import os
+import functools
+import aioboto3
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+import aws_session
+
+# Load environment variables
+load_dotenv()
+
+# Model ID for Claude 3.5 Sonnet
+MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+
+# Bedrock inference latency mode ("standard" or "optimized"). Latency-optimized
+# inference is only offered for some models and regions; if Bedrock rejects it,
+# requests fall back to "standard".
+LATENCY_MODES = ("standard", "optimized")
+BEDROCK_LATENCY_MODE = os.environ.get("BEDROCK_LATENCY_MODE", "standard").strip().lower()
+if BEDROCK_LATENCY_MODE not in LATENCY_MODES:
+    raise ValueError(
+        f"BEDROCK_LATENCY_MODE must be one of {', '.join(LATENCY_MODES)}, "
+        f"got {os.environ['BEDROCK_LATENCY_MODE']!r}"
+    )
+
+# Latency mode actually sent; drops to "standard" once Bedrock rejects "optimized"
+_latency_mode = BEDROCK_LATENCY_MODE
+
+# Prefix of the text returned (instead of a response) when a Bedrock call fails
+ERROR_PREFIX = "Error generating IAM policy: "
+
+# System prompt shared by every request. It is not followed by a prompt cache
+# point: at roughly 300 tokens it is well under the 1,024-token minimum Bedrock
+# requires for a Claude cache checkpoint, so a cachePoint would have no effect.
+SYSTEM_PROMPT = """
+    You are an AWS IAM policy expert assistant. Your task is to generate minimum viable permission (MVP) 
+    IAM policies based on the user's description of their AWS use case.
+    
+    Follow these guidelines:
+    1. Analyze the user's request carefully to understand their specific AWS use case
+    2. Generate the most restrictive IAM policy that still allows all necessary operations
+    3. Follow the principle of least privilege
+    4. Include only the permissions that are absolutely necessary
+    5. Use resource-level restrictions whenever possible
+    6. Provide clear explanations for why each permission is included
+    7. Format the policy according to AWS IAM JSON syntax
+    8. Highlight any potential security concerns or recommendations
+    
+    Your response should include:
+    1. A summary of your understanding of the use case
+    2. The complete IAM policy in JSON format (enclosed in ```json and ``` markers)
+    3. A detailed explanation of each permission and why it's necessary
+    4. Any security recommendations or best practices relevant to this use case
+    
+    IMPORTANT: Always format the policy JSON with proper indentation and enclose it in ```json and ``` markers
+    to make it easy to extract.
+    """
+
+@functools.lru_cache(maxsize=1)
+def get_bedrock_client():
+    """Initialize and return the shared (thread-safe) Bedrock client"""
+    return aws_session.client(
+        "bedrock-runtime",
+        region_name=os.environ.get("AWS_REGION", "us-east-1"),
+        aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY")
+    )
+
+@functools.lru_cache(maxsize=1)
+def get_bedrock_session():
+    """Initialize and return an async Bedrock session (clients are created per request from it)"""
+    return aioboto3.Session(
+        region_name=os.environ.get("AWS_REGION", "us-east-1"),
+        aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY")
+    )
+
+def _converse_kwargs(prompt, latency_mode):
+    """Build the Converse request shared by the sync and streaming calls"""
+    return {
+        "modelId": MODEL_ID,
+        "system": [{"text": SYSTEM_PROMPT}],
+        "messages": [
+            {
+                "role": "user",
+                "content": [{"text": prompt}]
+            }
+        ],
+        "inferenceConfig": {"maxTokens": 4096},
+        "performanceConfig": {"latency": latency_mode}
+    }
+
+def _fall_back_to_standard(error, latency_mode):
+    """
+    Decide whether a failed request should be retried with standard latency.
+    
+    Returns:
+        bool: True (and future requests use "standard") if Bedrock rejected
+            an "optimized" request as invalid
+    """
+    global _latency_mode
+    if latency_mode == "standard" or not isinstance(error, ClientError):
+        return False
+    if error.response.get("Error", {}).get("Code") != "ValidationException":
+        return False
+    _latency_mode = "standard"
+    return True
+
+def generate_iam_policy(prompt, client):
+    """Generate an IAM policy using the Bedrock Claude model"""
+    try:
+        latency_mode = _latency_mode
+        try:
+            response = client.converse(**_converse_kwargs(prompt, latency_mode))
+        except ClientError as e:
+            if not _fall_back_to_standard(e, latency_mode):
+                raise
+            response = client.converse(**_converse_kwargs(prompt, "standard"))
+        return response["output"]["message"]["content"][0]["text"]
+    except Exception as e:
+        return f"{ERROR_PREFIX}{str(e)}"
+
+async def stream_iam_policy(prompt, session):
+    """Generate an IAM policy, yielding the accumulated response text as it streams in"""
+    text = ""
+    try:
+        async with session.client("bedrock-runtime") as client:
+            latency_mode = _latency_mode
+            try:
+                response = await client.converse_stream(**_converse_kwargs(prompt, latency_mode))
+            except ClientError as e:
+                if not _fall_back_to_standard(e, latency_mode):
+                    raise
+                response = await client.converse_stream(**_converse_kwargs(prompt, "standard"))
+            
+            async for event in response['stream']:
+                if 'contentBlockDelta' in event:
+                    text += event['contentBlockDelta']['delta'].get('text', '')
+                    yield text
+    except Exception as e:
+        yield f"{ERROR_PREFIX}{str(e)}"
@@ -9,80 +9,87 @@ Usage:
   python generate_policy_cli.py "I need permissions for an EC2 instance to read from an S3 bucket named 'data-bucket'"
   python generate_policy_cli.py --file use_case.txt
   python generate_policy_cli.py --save my_policy "I need permissions for a Lambda to access DynamoDB"
+  python generate_policy_cli.py --files use_cases/*.txt --out-dir out
 """
 
 import os
 import sys
-import json
 import argparse
-import boto3
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from policy_validator import PolicyValidator
 from policy_utils import PolicyUtils
+from bedrock_core import ERROR_PREFIX, get_bedrock_client, generate_iam_policy
+import json_utils
 import traceback
 
 # Load environment variables
 load_dotenv()
 
-def get_bedrock_client():
-    """Initialize and return a Bedrock client"""
-    return boto3.client(
-        service_name="bedrock-runtime",
-        region_name=os.environ.get("AWS_REGION", "us-east-1"),
-        aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID"),
-        aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY")
-    )
+def _output_name(path):
+    """Return the name a use case file's policy is saved under"""
+    return PolicyUtils.clean_name(os.path.splitext(os.path.basename(path))[0])
 
-def generate_iam_policy(prompt, client):
-    """Generate an IAM policy using the Bedrock Claude model"""
-    MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+def duplicate_output_names(paths):
+    """Return the output names shared by more than one of the files, sorted"""
+    counts = Counter(_output_name(path) for path in paths)
+    return sorted(name for name, count in counts.items() if count > 1)
+
+def generate_policies_from_files(paths, client, out_dir="out", max_workers=8):
+    """
+    Generate policies for several use case files concurrently.
     
-    system_prompt = """
-    You are an AWS IAM policy expert assistant. Your task is to generate minimum viable permission (MVP) 
-    IAM policies based on the user's description of their AWS use case.
+    Each file's policy is saved as <out_dir>/<file name>.json. The Bedrock
+    calls are network-bound and the client is thread-safe, so they run in a
+    thread pool sharing one client.
     
-    Follow these guidelines:
-    1. Analyze the user's request carefully to understand their specific AWS use case
-    2. Generate the most restrictive IAM policy that still allows all necessary operations
-    3. Follow the principle of least privilege
-    4. Include only the permissions that are absolutely necessary
-    5. Use resource-level restrictions whenever possible
-    6. Provide clear explanations for why each permission is included
-    7. Format the policy according to AWS IAM JSON syntax
-    8. Highlight any potential security concerns or recommendations
+    Returns:
+        int: Number of files that failed
+        
+    Raises:
+        ValueError: If two files would be saved under the same name
+    """
+    # Files saved under the same name would overwrite each other (and race
+    # on the same temporary file), so refuse them up front
+    duplicates = duplicate_output_names(paths)
+    if duplicates:
+        raise ValueError(f"Files map to the same output name: {', '.join(duplicates)}")
     
-    Your response should include:
-    1. A summary of your understanding of the use case
-    2. The complete IAM policy in JSON format (enclosed in ```json and ``` markers)
-    3. A detailed explanation of each permission and why it's necessary
-    4. Any security recommendations or best practices relevant to this use case
+    policy_utils = PolicyUtils(out_dir)
+    policy_validator = PolicyValidator()
     
-    IMPORTANT: Always format the policy JSON with proper indentation and enclose it in ```json and ``` markers
-    to make it easy to extract.
-    """
+    def process(path):
+        name = _output_name(path)
+        try:
+            with open(path, 'r') as f:
+                prompt = f.read().strip()
+            
+            response = generate_iam_policy(prompt, client)
+            json_str, policy = policy_validator.extract_policy_from_text(response)
+            if not json_str:
+                # Report the Bedrock error itself rather than the missing policy
+                if response.startswith(ERROR_PREFIX):
+                    return path, None, response
+                return path, None, "Could not extract a valid policy from the response"
+            
+            filepath = policy_utils.save_policy(policy, name, f"Policy generated from: {prompt[:50]}...")
+            if not filepath:
+                return path, None, "Failed to save policy"
+            return path, filepath, None
+        except Exception as e:
+            return path, None, str(e)
     
-    try:
-        response = client.invoke_model(
-            modelId=MODEL_ID,
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 4096,
-                "system": system_prompt,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            })
-        )
-        
-        response_body = json.loads(response.get('body').read().decode('utf-8'))
-        return response_body['content'][0]['text']
-    except Exception as e:
-        return f"Error generating IAM policy: {str(e)}"
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for path, filepath, error in executor.map(process, paths):
+            if error:
+                print(f"❌ {path}: {error}")
+                failed += 1
+            else:
+                print(f"✅ {path} -> {filepath}")
+    
+    return failed
 
 def main():
     
@@ -92,14 +99,35 @@ def main():
     input_group = parser.add_mutually_exclusive_group(required=True)
     input_group.add_argument("prompt", nargs="?", help="Use case description for policy generation")
     input_group.add_argument("--file", help="File containing the use case description")
+    input_group.add_argument("--files", nargs="+", metavar="FILE", help="Generate one policy per use case file, concurrently")
     
     # Other arguments
     parser.add_argument("--save", metavar="NAME", help="Save the generated policy with the specified name")
     parser.add_argument("--validate", action="store_true", help="Validate the generated policy")
     parser.add_argument("--json-only", action="store_true", help="Output only the JSON policy")
+    parser.add_argument("--out-dir", default="out", help="Output directory for --files (default: out)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent Bedrock requests for --files (default: 8)")
     
     args = parser.parse_args()
     
+    # Batch mode: one policy per file
+    if args.files:
+        if args.save or args.validate or args.json_only:
+            parser.error("--save, --validate and --json-only cannot be used with --files")
+        duplicates = duplicate_output_names(args.files)
+        if duplicates:
+            parser.error(f"--files map to the same output name: {', '.join(duplicates)}")
+        
+        try:
+            client = get_bedrock_client()
+            print(f"Generating {len(args.files)} IAM policies... (this may take a moment)")
+            failed = generate_policies_from_files(args.files, client, args.out_dir, args.workers)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            traceback.print_exc()
+            sys.exit(1)
+        sys.exit(1 if failed else 0)
+    
     # Get the prompt from either command line or file
     if args.prompt:
         prompt = args.prompt
@@ -134,7 +162,7 @@ def main():
         
         # Output based on options
         if args.json_only:
-            print(json.dumps(policy, indent=2))
+            print(json_utils.dumps(policy, indent=True))
         else:
             print(response)
         
@@ -161,7 +189,7 @@ def main():
         
         # Save if requested
         if args.save:
-            filepath = policy_utils.save_policy(json_str, args.save, f"Policy generated from: {prompt[:50]}...")
+            filepath = policy_utils.save_policy(policy, args.save, f"Policy generated from: {prompt[:50]}...")
             if filepath:
                 print(f"\nPolicy saved to: {filepath}")
             else:
@@ -0,0 +1,43 @@
+"""
+JSON encoding and decoding helpers.
+
+Uses orjson when it is installed and falls back to the standard library
+json module otherwise. Decode errors are json.JSONDecodeError (or a subclass
+of it) with either backend.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSONDecodeError = json.JSONDecodeError
+
+def loads(data):
+    """Parse JSON from a str, bytes or memoryview object"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+def dumps(obj, indent=False, sort_keys=False):
+    """Serialize an object to a JSON str, compact or with 2-space indentation"""
+    if orjson is not None:
+        return dumpb(obj, indent, sort_keys).decode("utf-8")
+    if indent:
+        return json.dumps(obj, indent=2, sort_keys=sort_keys)
+    return json.dumps(obj, sort_keys=sort_keys, separators=(",", ":"))
+
+def dumpb(obj, indent=False, sort_keys=False):
+    """Serialize an object to UTF-8 encoded JSON bytes"""
+    if orjson is not None:
+        option = 0
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option)
+    return dumps(obj, indent, sort_keys).encode("utf-8")
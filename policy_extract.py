@@ -0,0 +1,112 @@
+"""
+Helpers for locating an IAM policy in free-form model output.
+
+This is the single place that knows how policies are found in text: a
+```json fenced block first, then a bare JSON object starting with "Version".
+"""
+
+import json_utils
+
+def extract_fenced_json(text):
+    """
+    Return the contents of the first ```json fenced block in the text.
+    
+    The fence delimiters are fixed strings, so two str.find calls locate
+    the block without going through the regex engine.
+    
+    Args:
+        text (str): Text that may contain a fenced JSON block
+        
+    Returns:
+        str: The stripped block contents, or None if there is no complete block
+    """
+    start = text.find("```json")
+    if start == -1:
+        return None
+    start += len("```json")
+    end = text.find("```", start)
+    if end == -1:
+        return None
+    return text[start:end].strip()
+
+def extract_json_object(text, start_hint='"Version"'):
+    """
+    Find a JSON object in free text whose first key is the given hint.
+    
+    The object is located by walking forward from its opening brace and
+    tracking brace depth (ignoring braces inside strings), so the scan is
+    linear in the length of the text.
+    
+    Args:
+        text (str): Text that may contain a JSON object
+        start_hint (str): The first key that identifies the object
+        
+    Returns:
+        str: The JSON object text, or None if no balanced object is found
+    """
+    pos = text.find(start_hint)
+    while pos != -1:
+        # The hint must be directly preceded by the object's opening brace
+        start = pos - 1
+        while start >= 0 and text[start].isspace():
+            start -= 1
+        
+        if start >= 0 and text[start] == "{":
+            depth = 0
+            in_string = False
+            escaped = False
+            for i in range(start, len(text)):
+                char = text[i]
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif char == "\\":
+                        escaped = True
+                    elif char == '"':
+                        in_string = False
+                elif char == '"':
+                    in_string = True
+                elif char == "{":
+                    depth += 1
+                elif char == "}":
+                    depth -= 1
+                    if depth == 0:
+                        return text[start:i + 1]
+            # Unbalanced to the end of the text; stop rather than rescan from a later hint
+            return None
+        
+        pos = text.find(start_hint, pos + len(start_hint))
+    return None
+
+def extract_policy(text):
+    """
+    Extract a JSON policy from a text that may contain other content.
+    
+    Args:
+        text (str): Text that contains a JSON policy
+        
+    Returns:
+        tuple: (json_str, policy) where json_str is the extracted policy JSON string
+            and policy is the parsed JSON object, or (None, None) if not found
+    """
+    try:
+        # Look for JSON content between triple backticks
+        json_str = extract_fenced_json(text)
+        
+        if json_str is not None:
+            # Validate it's proper JSON
+            policy = json_utils.loads(json_str)
+            return json_str, policy
+        
+        # Alternative: look for content that looks like JSON
+        json_str = extract_json_object(text)
+        
+        if json_str:
+            # Validate it's proper JSON
+            policy = json_utils.loads(json_str)
+            return json_str, policy
+            
+        return None, None
+    except Exception:
+        # Malformed JSON (json_utils.JSONDecodeError) or anything else unexpected
+        return None, None
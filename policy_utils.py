@@ -1,7 +1,9 @@
 import os
-import json
 import datetime
+import tempfile
 from pathlib import Path
+from policy_extract import extract_policy
+import json_utils
 
 class PolicyUtils:
     """
@@ -17,9 +19,17 @@ class PolicyUtils:
         """
         self.policies_dir = policies_dir
         
+        # Cached (directory mtime, policy filenames) from the last listing
+        self._list_cache = (None, [])
+        
         # Create the policies directory if it doesn't exist
         os.makedirs(self.policies_dir, exist_ok=True)
     
+    @staticmethod
+    def clean_name(name):
+        """Return a policy name with characters unsafe in filenames replaced by '_'"""
+        return "".join(c if c.isalnum() or c in ['-', '_'] else '_' for c in name)
+    
     def save_policy(self, policy_json, name=None, description=None):
         """
         Save a policy to a JSON file.
@@ -35,7 +45,7 @@ class PolicyUtils:
         try:
             # Parse the policy if it's a string
             if isinstance(policy_json, str):
-                policy_dict = json.loads(policy_json)
+                policy_dict = json_utils.loads(policy_json)
             else:
                 policy_dict = policy_json
             
@@ -45,7 +55,7 @@ class PolicyUtils:
                 name = f"policy_{timestamp}"
             else:
                 # Clean the name to be a valid filename
-                name = "".join(c if c.isalnum() or c in ['-', '_'] else '_' for c in name)
+                name = self.clean_name(name)
             
             # Add metadata
             metadata = {
@@ -63,8 +73,19 @@ class PolicyUtils:
             filename = f"{name}.json"
             filepath = os.path.join(self.policies_dir, filename)
             
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=2)
+            # Write to a uniquely named temporary file and swap it in, so a
+            # crash mid-write never leaves a truncated policy behind and
+            # concurrent saves of the same name never share a temporary file
+            fd, tmp_filepath = tempfile.mkstemp(dir=self.policies_dir, prefix=f"{name}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(json_utils.dumpb(data, indent=True))
+                # mkstemp creates the file readable by the owner only
+                os.chmod(tmp_filepath, 0o644)
+                os.replace(tmp_filepath, filepath)
+            except BaseException:
+                os.unlink(tmp_filepath)
+                raise
             
             return filepath
         
@@ -85,8 +106,8 @@ class PolicyUtils:
         try:
             filepath = os.path.join(self.policies_dir, filename)
             
-            with open(filepath, 'r') as f:
-                data = json.load(f)
+            with open(filepath, 'rb') as f:
+                data = json_utils.loads(f.read())
             
             return data
         
@@ -102,13 +123,17 @@ class PolicyUtils:
             list: List of policy filenames
         """
         try:
-            policies = []
+            # Adding, removing or renaming a file updates the directory mtime
+            mtime = os.stat(self.policies_dir).st_mtime_ns
+            cached_mtime, cached_policies = self._list_cache
+            if mtime == cached_mtime:
+                return list(cached_policies)
             
-            for file in os.listdir(self.policies_dir):
-                if file.endswith('.json'):
-                    policies.append(file)
+            with os.scandir(self.policies_dir) as entries:
+                policies = [entry.name for entry in entries if entry.name.endswith('.json') and entry.is_file()]
             
-            return policies
+            self._list_cache = (mtime, policies)
+            return list(policies)
         
         except Exception as e:
             print(f"Error listing policies: {str(e)}")
@@ -127,32 +152,13 @@ class PolicyUtils:
             tuple: (success, filepath or error message)
         """
         try:
-            # Look for JSON content between triple backticks
-            import re
-            json_pattern = r"```json\s*([\s\S]*?)\s*```"
-            match = re.search(json_pattern, text)
-            
-            if match:
-                json_str = match.group(1).strip()
-                # Validate it's proper JSON
-                json.loads(json_str)
-                filepath = self.save_policy(json_str, name, description)
-                return (True, filepath)
+            json_str, policy = extract_policy(text)
             
-            # Alternative: look for content that looks like JSON
-            json_pattern = r"\{\s*\"Version\"[\s\S]*?\"Statement\"[\s\S]*?\}"
-            match = re.search(json_pattern, text)
+            if not json_str:
+                return (False, "No valid policy JSON found in the text")
             
-            if match:
-                json_str = match.group(0).strip()
-                # Validate it's proper JSON
-                json.loads(json_str)
-                filepath = self.save_policy(json_str, name, description)
-                return (True, filepath)
-                
-            return (False, "No valid policy JSON found in the text")
+            filepath = self.save_policy(policy, name, description)
+            return (True, filepath)
         
-        except json.JSONDecodeError:
-            return (False, "Invalid JSON format in the extracted policy")
         except Exception as e:
             return (False, f"Error extracting and saving policy: {str(e)}")
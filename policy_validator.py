@@ -1,5 +1,13 @@
-import json
-import re
+import copy
+import functools
+import json_utils
+from policy_extract import extract_policy
+
+def _as_list(value):
+    """Return a policy element that may be a single value or a list as a list"""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
 
 class PolicyValidator:
     """
@@ -9,7 +17,7 @@ class PolicyValidator:
     
     def __init__(self):
         # Common overly permissive actions that should be flagged
-        self.overly_permissive_actions = [
+        self.overly_permissive_actions = frozenset([
             "*",
             "s3:*",
             "ec2:*",
@@ -17,10 +25,10 @@ class PolicyValidator:
             "dynamodb:*",
             "lambda:*",
             "cloudformation:*"
-        ]
+        ])
         
         # Actions that should be carefully reviewed
-        self.sensitive_actions = [
+        self.sensitive_actions = frozenset([
             "iam:CreateUser",
             "iam:CreateRole",
             "iam:PutRolePolicy",
@@ -31,14 +39,20 @@ class PolicyValidator:
             "lambda:CreateFunction",
             "kms:Decrypt",
             "secretsmanager:GetSecretValue"
-        ]
+        ])
+        
+        # Validation results keyed by canonical policy JSON, so identical
+        # policies are only checked once
+        self._validate_canonical = functools.lru_cache(maxsize=256)(self._validate_canonical_json)
     
-    def validate_policy(self, policy_json):
+    def validate_policy(self, policy_json, fail_fast=False):
         """
         Validate an IAM policy and return a list of recommendations.
         
         Args:
             policy_json (str): The policy JSON as a string
+            fail_fast (bool): Stop at the first issue that makes the policy
+                invalid, when only the valid flag is needed
             
         Returns:
             dict: Validation results with issues and recommendations
@@ -46,71 +60,16 @@ class PolicyValidator:
         try:
             # Parse the policy JSON
             if isinstance(policy_json, str):
-                policy = json.loads(policy_json)
+                policy = json_utils.loads(policy_json)
             else:
                 policy = policy_json
-                
-            # Initialize results
-            results = {
-                "valid": True,
-                "issues": [],
-                "recommendations": []
-            }
-            
-            # Check for policy structure
-            if "Version" not in policy:
-                results["issues"].append("Missing 'Version' field in policy")
-                results["recommendations"].append("Add 'Version': '2012-10-17' to the policy")
-                results["valid"] = False
-                
-            if "Statement" not in policy:
-                results["issues"].append("Missing 'Statement' field in policy")
-                results["valid"] = False
-                return results
-            
-            # Analyze each statement
-            statements = policy["Statement"]
-            if not isinstance(statements, list):
-                statements = [statements]
-                
-            for i, statement in enumerate(statements):
-                # Check for overly permissive actions
-                if "Action" in statement:
-                    actions = statement["Action"] if isinstance(statement["Action"], list) else [statement["Action"]]
-                    
-                    for action in actions:
-                        if action in self.overly_permissive_actions:
-                            results["issues"].append(f"Statement {i+1} contains overly permissive action: {action}")
-                            results["recommendations"].append(f"Replace '{action}' with specific actions needed for the use case")
-                            results["valid"] = False
-                    
-                    # Check for sensitive actions
-                    for action in actions:
-                        if action in self.sensitive_actions:
-                            results["issues"].append(f"Statement {i+1} contains sensitive action: {action}")
-                            results["recommendations"].append(f"Review if '{action}' is absolutely necessary and consider adding conditions")
-                
-                # Check for missing resource constraints
-                if "Resource" in statement:
-                    resources = statement["Resource"] if isinstance(statement["Resource"], list) else [statement["Resource"]]
-                    
-                    for resource in resources:
-                        if resource == "*":
-                            results["issues"].append(f"Statement {i+1} applies to all resources ('*')")
-                            results["recommendations"].append("Specify exact resource ARNs instead of using '*'")
-                            results["valid"] = False
-                else:
-                    results["issues"].append(f"Statement {i+1} is missing 'Resource' field")
-                    results["recommendations"].append("Add specific resource ARNs to the statement")
-                    results["valid"] = False
-                
-                # Check for missing conditions
-                if "Condition" not in statement:
-                    results["recommendations"].append(f"Consider adding conditions to Statement {i+1} for additional security")
             
-            return results
+            # Look up (or compute) results for the canonical form, returning a
+            # copy so callers can't mutate the cache entry
+            canonical_json = json_utils.dumps(policy, sort_keys=True)
+            return copy.deepcopy(self._validate_canonical(canonical_json, fail_fast))
             
-        except json.JSONDecodeError:
+        except json_utils.JSONDecodeError:
             return {
                 "valid": False,
                 "issues": ["Invalid JSON format"],
@@ -123,6 +82,112 @@ class PolicyValidator:
                 "recommendations": ["Review the policy structure"]
             }
     
+    def validate_policies(self, policies, fail_fast=False):
+        """
+        Validate several IAM policies in one call.
+        
+        Args:
+            policies (iterable): Policy JSON strings or parsed policies
+            fail_fast (bool): Stop each policy at its first invalidating issue
+            
+        Returns:
+            list: Validation results for each policy, in order
+        """
+        return [self.validate_policy(policy, fail_fast) for policy in policies]
+    
+    def _validate_canonical_json(self, canonical_json, fail_fast=False):
+        """
+        Run the validation rules against a policy in canonical JSON form.
+        
+        Args:
+            canonical_json (str): The policy serialized with sorted keys
+            fail_fast (bool): Return as soon as the policy is found invalid
+            
+        Returns:
+            dict: Validation results with issues and recommendations
+        """
+        policy = json_utils.loads(canonical_json)
+        
+        # Initialize results
+        results = {
+            "valid": True,
+            "issues": [],
+            "recommendations": []
+        }
+        
+        # Check for policy structure
+        if "Version" not in policy:
+            results["issues"].append("Missing 'Version' field in policy")
+            results["recommendations"].append("Add 'Version': '2012-10-17' to the policy")
+            results["valid"] = False
+            if fail_fast:
+                return results
+            
+        if "Statement" not in policy:
+            results["issues"].append("Missing 'Statement' field in policy")
+            results["valid"] = False
+            return results
+        
+        # Analyze each statement
+        statements = policy["Statement"]
+        if not isinstance(statements, list):
+            statements = [statements]
+        
+        for i, statement in enumerate(statements, 1):
+            # Statements must be objects; anything else can't be checked further
+            if not isinstance(statement, dict):
+                results["issues"].append(f"Statement {i} is not a JSON object")
+                results["recommendations"].append("Write each statement as an object with 'Effect', 'Action' and 'Resource' fields")
+                results["valid"] = False
+                if fail_fast:
+                    return results
+                continue
+            
+            # Normalize the statement once so the rule checks below work on plain lists
+            actions = _as_list(statement.get("Action"))
+            resources = _as_list(statement["Resource"]) if "Resource" in statement else None
+            has_condition = "Condition" in statement
+            
+            # Check for malformed, overly permissive and sensitive actions
+            for action in actions:
+                if not isinstance(action, str):
+                    results["issues"].append(f"Statement {i} contains an action that is not a string: {json_utils.dumps(action)}")
+                    results["recommendations"].append("List each action as a string such as 's3:GetObject'")
+                    results["valid"] = False
+                    if fail_fast:
+                        return results
+                elif action in self.overly_permissive_actions:
+                    results["issues"].append(f"Statement {i} contains overly permissive action: {action}")
+                    results["recommendations"].append(f"Replace '{action}' with specific actions needed for the use case")
+                    results["valid"] = False
+                    if fail_fast:
+                        return results
+                elif action in self.sensitive_actions:
+                    results["issues"].append(f"Statement {i} contains sensitive action: {action}")
+                    results["recommendations"].append(f"Review if '{action}' is absolutely necessary and consider adding conditions")
+            
+            # Check for missing resource constraints
+            if resources is None:
+                results["issues"].append(f"Statement {i} is missing 'Resource' field")
+                results["recommendations"].append("Add specific resource ARNs to the statement")
+                results["valid"] = False
+                if fail_fast:
+                    return results
+            else:
+                for resource in resources:
+                    if resource == "*":
+                        results["issues"].append(f"Statement {i} applies to all resources ('*')")
+                        results["recommendations"].append("Specify exact resource ARNs instead of using '*'")
+                        results["valid"] = False
+                        if fail_fast:
+                            return results
+            
+            # Check for missing conditions
+            if not has_condition:
+                results["recommendations"].append(f"Consider adding conditions to Statement {i} for additional security")
+        
+        return results
+    
     def extract_policy_from_text(self, text):
         """
         Extract a JSON policy from a text that may contain other content.
@@ -134,29 +199,4 @@ class PolicyValidator:
             tuple: (json_str, policy) where json_str is the extracted policy JSON string
                 and policy is the parsed JSON object, or (None, None) if not found
         """
-        try:
-            # Look for JSON content between triple backticks
-            json_pattern = r"```json\s*([\s\S]*?)\s*```"
-            match = re.search(json_pattern, text)
-            
-            if match:
-                json_str = match.group(1).strip()
-                # Validate it's proper JSON
-                policy = json.loads(json_str)
-                return json_str, policy
-            
-            # Alternative: look for content that looks like JSON
-            json_pattern = r"\{\s*\"Version\"[\s\S]*?\"Statement\"[\s\S]*?\}"
-            match = re.search(json_pattern, text)
-            
-            if match:
-                json_str = match.group(0).strip()
-                # Validate it's proper JSON
-                policy = json.loads(json_str)
-                return json_str, policy
-                
-            return None, None
-        except json.JSONDecodeError:
-            return None, None
-        except Exception:
-            return None, None
+        return extract_policy(text)
@@ -1,10 +1,71 @@
 import os
-import json
-import boto3
-from dotenv import load_dotenv
+import sys
+import asyncio
+from botocore.config import Config
+import json_utils
+from aws_session import client as aws_client
 
-# Load environment variables
-load_dotenv()
+# Test model ID
+MODEL_ID = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+
+# Bedrock client shared by every test call, so repeated invocations reuse
+# pooled keep-alive connections instead of paying a new TLS handshake
+_BEDROCK_CLIENT = None
+
+# Fixed part of every test request body
+_REQUEST_TEMPLATE = {
+    "anthropic_version": "bedrock-2023-05-31",
+    "max_tokens": 100,
+    "system": "You are a helpful assistant."
+}
+
+def _request_body(prompt):
+    """Serialize a test request body for the prompt"""
+    return json_utils.dumpb({
+        **_REQUEST_TEMPLATE,
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    })
+
+# Simple test prompt, with its request body serialized once
+TEST_PROMPT = "What are AWS IAM policies?"
+_TEST_BODY = _request_body(TEST_PROMPT)
+
+# Settings this script takes from the environment or the .env file
+_ENV_VARS = ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_REGION")
+
+def _load_env():
+    """Load the .env file, unless every setting it provides is already exported"""
+    if all(os.environ.get(name) for name in _ENV_VARS):
+        return
+    
+    # Search like load_dotenv() does, so a .env next to the script is found
+    # whatever the working directory
+    from dotenv import find_dotenv, load_dotenv
+    dotenv_path = find_dotenv()
+    if dotenv_path:
+        load_dotenv(dotenv_path)
+
+def _get_client():
+    """Return the shared Bedrock client, creating it on first use"""
+    global _BEDROCK_CLIENT
+    if _BEDROCK_CLIENT is None:
+        _load_env()
+        # Credentials are resolved by botocore's default chain
+        # (environment, shared credentials file, instance profile, ...)
+        _BEDROCK_CLIENT = aws_client(
+            "bedrock-runtime",
+            region_name=os.environ.get("AWS_REGION", "us-east-1"),
+            config=Config(
+                tcp_keepalive=True,
+                retries={"max_attempts": 2, "mode": "adaptive"}
+            )
+        )
+    return _BEDROCK_CLIENT
 
 def test_bedrock_connection():
     """
@@ -15,45 +76,28 @@ def test_bedrock_connection():
     print("Testing connection to AWS Bedrock...")
     
     try:
-        # Initialize Bedrock client
-        client = boto3.client(
-            service_name="bedrock-runtime",
-            region_name=os.environ.get("AWS_REGION", "us-east-1"),
-            aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY")
-        )
-        
-        # Test model ID
-        model_id = "us.anthropic.claude-3-5-sonnet-20241022-v2:0"
+        # Get the shared Bedrock client
+        client = _get_client()
         
-        # Simple test prompt
-        test_prompt = "What are AWS IAM policies?"
-        
-        # Invoke model with a simple prompt
-        response = client.invoke_model(
-            modelId=model_id,
+        # Invoke model with a simple prompt, streaming the response
+        response = client.invoke_model_with_response_stream(
+            modelId=MODEL_ID,
             contentType="application/json",
             accept="application/json",
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 100,
-                "system": "You are a helpful assistant.",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": test_prompt
-                    }
-                ]
-            })
+            body=_TEST_BODY
         )
         
-        # Parse response
-        response_body = json.loads(response.get('body').read().decode('utf-8'))
-        response_text = response_body['content'][0]['text']
-        
-        print("\n✅ Connection successful! Received response from Bedrock:")
+        print("\n✅ Connection successful! Streaming response from Bedrock:")
         print("-" * 50)
-        print(response_text[:200] + "..." if len(response_text) > 200 else response_text)
+        
+        # Write each text delta as it arrives
+        for event in response['body']:
+            chunk = json_utils.loads(event['chunk']['bytes'])
+            if chunk['type'] == 'content_block_delta':
+                sys.stdout.write(chunk['delta'].get('text', ''))
+                sys.stdout.flush()
+        
+        print()
         print("-" * 50)
         print("\nYour AWS credentials are correctly configured.")
         print("You can now run the main application with: python app.py")
@@ -67,7 +111,73 @@ def test_bedrock_connection():
         print("1. AWS credentials in the .env file")
         print("2. AWS region (make sure Bedrock is available in your selected region)")
         print("3. Network connectivity")
-        print("4. AWS IAM permissions (ensure your user/role has bedrock:InvokeModel permission)")
+        print("4. AWS IAM permissions (ensure your user/role has bedrock:InvokeModelWithResponseStream permission, which the app's streaming chat also needs)")
+
+async def run_connection_test_async(prompts, max_concurrency=20):
+    """
+    Send several test prompts to AWS Bedrock concurrently.
+    
+    Args:
+        prompts (list): Prompts to send
+        max_concurrency (int): Maximum number of requests in flight at once
+        
+    Returns:
+        list: The response text, or the raised exception, for each prompt in order
+    """
+    # The async SDK is only imported when this batch mode runs
+    import aioboto3
+    from aiobotocore.config import AioConfig
+    
+    _load_env()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    session = aioboto3.Session()
+    
+    async with session.client(
+        "bedrock-runtime",
+        region_name=os.environ.get("AWS_REGION", "us-east-1"),
+        config=AioConfig(max_pool_connections=50)
+    ) as client:
+        async def invoke(prompt):
+            async with semaphore:
+                response = await client.invoke_model(
+                    modelId=MODEL_ID,
+                    contentType="application/json",
+                    accept="application/json",
+                    body=_request_body(prompt)
+                )
+                response_body = json_utils.loads(await response['body'].read())
+                return response_body['content'][0]['text']
+        
+        return await asyncio.gather(*(invoke(prompt) for prompt in prompts), return_exceptions=True)
+
+def run_connection_test(prompts):
+    """
+    Test the connection to AWS Bedrock with several prompts sent concurrently.
+    
+    Returns:
+        int: Number of prompts that failed
+    """
+    print(f"Testing connection to AWS Bedrock with {len(prompts)} prompts...")
+    
+    results = asyncio.run(run_connection_test_async(prompts))
+    
+    failed = 0
+    for prompt, result in zip(prompts, results):
+        print("-" * 50)
+        print(f"Prompt: {prompt}")
+        if isinstance(result, Exception):
+            print(f"❌ Failed: {str(result)}")
+            failed += 1
+        else:
+            print(f"✅ {result[:200] + '...' if len(result) > 200 else result}")
+    print("-" * 50)
+    print(f"\n{len(prompts) - failed}/{len(prompts)} prompts succeeded.")
+    
+    return failed
 
 if __name__ == "__main__":
-    test_bedrock_connection()
+    # Prompts given on the command line are sent concurrently
+    if len(sys.argv) > 1:
+        sys.exit(1 if run_connection_test(sys.argv[1:]) else 0)
+    else:
+        test_bedrock_connection()
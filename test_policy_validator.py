@@ -3,101 +3,218 @@
 Test script for the PolicyValidator class.
 
 This script tests the functionality of the PolicyValidator class by validating
-example policies against best practices.
+example policies against best practices, and checks that policies are
+located correctly in model output.
 
 Usage:
   python test_policy_validator.py
 """
 
-import json
 import os
+import sys
+import mmap
+import functools
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from concurrent.futures import ProcessPoolExecutor
+import json_utils
+from policy_extract import extract_fenced_json, extract_json_object, extract_policy
 from policy_validator import PolicyValidator
 
-def test_validator():
-    """Test the PolicyValidator with various policy examples"""
-    validator = PolicyValidator()
+@dataclass(frozen=True)
+class PolicyTestCase:
+    """
+    A policy and whether the validator should accept it.
     
-    # Test cases with expected results
-    test_cases = [
-        {
-            "name": "Valid policy with specific resources",
-            "policy": {
-                "Version": "2012-10-17",
-                "Statement": [
-                    {
-                        "Effect": "Allow",
-                        "Action": [
-                            "s3:GetObject",
-                            "s3:ListBucket"
-                        ],
-                        "Resource": [
-                            "arn:aws:s3:::specific-bucket",
-                            "arn:aws:s3:::specific-bucket/*"
-                        ],
-                        "Condition": {
-                            "StringEquals": {
-                                "aws:PrincipalTag/Department": "DataScience"
-                            }
+    The policy's top level is a read-only MappingProxyType; the statements
+    inside it are ordinary lists and dicts.
+    """
+    name: str
+    policy: Mapping
+    expected_valid: bool
+
+# Test cases with expected results
+TEST_CASES = (
+    PolicyTestCase(
+        name="Valid policy with specific resources",
+        policy=MappingProxyType({
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Effect": "Allow",
+                    "Action": [
+                        "s3:GetObject",
+                        "s3:ListBucket"
+                    ],
+                    "Resource": [
+                        "arn:aws:s3:::specific-bucket",
+                        "arn:aws:s3:::specific-bucket/*"
+                    ],
+                    "Condition": {
+                        "StringEquals": {
+                            "aws:PrincipalTag/Department": "DataScience"
                         }
                     }
-                ]
-            },
-            "expected_valid": True
-        },
-        {
-            "name": "Policy with wildcard resource",
-            "policy": {
-                "Version": "2012-10-17",
-                "Statement": [
-                    {
-                        "Effect": "Allow",
-                        "Action": [
-                            "s3:GetObject",
-                            "s3:ListBucket"
-                        ],
-                        "Resource": "*"
-                    }
-                ]
-            },
-            "expected_valid": False
-        },
-        {
-            "name": "Policy with overly permissive action",
-            "policy": {
-                "Version": "2012-10-17",
-                "Statement": [
-                    {
-                        "Effect": "Allow",
-                        "Action": "s3:*",
-                        "Resource": [
-                            "arn:aws:s3:::specific-bucket",
-                            "arn:aws:s3:::specific-bucket/*"
-                        ]
-                    }
-                ]
-            },
-            "expected_valid": False
-        },
-        {
-            "name": "Policy missing Version",
-            "policy": {
-                "Statement": [
-                    {
-                        "Effect": "Allow",
-                        "Action": [
-                            "s3:GetObject",
-                            "s3:ListBucket"
-                        ],
-                        "Resource": [
-                            "arn:aws:s3:::specific-bucket",
-                            "arn:aws:s3:::specific-bucket/*"
-                        ]
-                    }
-                ]
-            },
-            "expected_valid": False
-        }
-    ]
+                }
+            ]
+        }),
+        expected_valid=True
+    ),
+    PolicyTestCase(
+        name="Policy with wildcard resource",
+        policy=MappingProxyType({
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Effect": "Allow",
+                    "Action": [
+                        "s3:GetObject",
+                        "s3:ListBucket"
+                    ],
+                    "Resource": "*"
+                }
+            ]
+        }),
+        expected_valid=False
+    ),
+    PolicyTestCase(
+        name="Policy with overly permissive action",
+        policy=MappingProxyType({
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Effect": "Allow",
+                    "Action": "s3:*",
+                    "Resource": [
+                        "arn:aws:s3:::specific-bucket",
+                        "arn:aws:s3:::specific-bucket/*"
+                    ]
+                }
+            ]
+        }),
+        expected_valid=False
+    ),
+    PolicyTestCase(
+        name="Policy missing Version",
+        policy=MappingProxyType({
+            "Statement": [
+                {
+                    "Effect": "Allow",
+                    "Action": [
+                        "s3:GetObject",
+                        "s3:ListBucket"
+                    ],
+                    "Resource": [
+                        "arn:aws:s3:::specific-bucket",
+                        "arn:aws:s3:::specific-bucket/*"
+                    ]
+                }
+            ]
+        }),
+        expected_valid=False
+    )
+)
+
+# Policy extraction cases: (name, model output, expected policy JSON or None)
+_STRING_BRACES_POLICY = '{"Version": "2012-10-17", "Statement": [{"Sid": "a}b{c", "Effect": "Allow", "Action": "s3:GetObject", "Resource": "arn:aws:s3:::b/*"}]}'
+_ESCAPED_QUOTE_POLICY = r'{"Version": "2012-10-17", "Statement": [{"Sid": "say \"}\" now", "Effect": "Allow", "Action": "s3:GetObject", "Resource": "arn:aws:s3:::b/*"}]}'
+_PLAIN_POLICY = '{"Version": "2012-10-17", "Statement": []}'
+
+EXTRACTION_CASES = (
+    (
+        "Fenced JSON block",
+        f"Here is the policy:\n```json\n{_PLAIN_POLICY}\n```\nDone.",
+        _PLAIN_POLICY
+    ),
+    (
+        "Braces inside string values",
+        f"Policy: {_STRING_BRACES_POLICY} and a stray }} after it",
+        _STRING_BRACES_POLICY
+    ),
+    (
+        "Escaped quotes before a brace",
+        f"Policy: {_ESCAPED_QUOTE_POLICY}",
+        _ESCAPED_QUOTE_POLICY
+    ),
+    (
+        "Unclosed fence falls back to the object scan",
+        f"Here is the policy:\n```json\n{_PLAIN_POLICY}\n",
+        _PLAIN_POLICY
+    ),
+    (
+        "Unbalanced object",
+        'Policy: {"Version": "2012-10-17", "Statement": [{"Effect": "Allow"}',
+        None
+    ),
+    (
+        "\"Version\" not preceded by a brace",
+        f'The "Version" key is required: {_PLAIN_POLICY}',
+        _PLAIN_POLICY
+    ),
+    (
+        "Only a bare \"Version\" mention",
+        'Set "Version": "2012-10-17" in your policy.',
+        None
+    ),
+    (
+        "Malformed fenced JSON",
+        '```json\n{"Version": "2012-10-17",}\n```',
+        None
+    )
+)
+
+@functools.lru_cache(maxsize=1)
+def _validator():
+    """Return the validator shared by every check in this process"""
+    return PolicyValidator()
+
+def _load_example(path):
+    """Load the policy part of an example policy file, parsing straight from an mmap"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Empty files can't be mapped; let the parser report them
+            policy_data = json_utils.loads(b"")
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                view = memoryview(buf)
+                try:
+                    policy_data = json_utils.loads(view)
+                finally:
+                    # The view must be released before the mmap can close
+                    view.release()
+    
+    # Extract the policy part
+    if "policy" in policy_data:
+        return policy_data["policy"]
+    return policy_data
+
+@functools.lru_cache(maxsize=None)
+def _example_corpus():
+    """
+    Load every example policy once per process.
+    
+    Returns:
+        tuple: (filename, policy, error message or None) for each file, in directory order
+    """
+    corpus = []
+    with os.scandir("example_policies") as it:
+        for entry in it:
+            if not (entry.name.endswith(".json") and entry.is_file()):
+                continue
+            try:
+                corpus.append((entry.name, _load_example(entry.path), None))
+            except Exception as e:
+                corpus.append((entry.name, None, str(e)))
+    return tuple(corpus)
+
+def _validate_chunk(policies):
+    """Validate a chunk of policies (runs in a worker process)"""
+    return _validator().validate_policies(policies)
+
+def test_validator():
+    """Test the PolicyValidator with various policy examples"""
+    validator = _validator()
     
     # Run tests
     passed = 0
@@ -105,64 +222,63 @@ def test_validator():
     
     print("=== Testing PolicyValidator ===\n")
     
-    for i, test_case in enumerate(test_cases, 1):
-        print(f"Test {i}: {test_case['name']}")
-        
-        # Validate the policy
-        result = validator.validate_policy(test_case["policy"])
+    # Validate every case in one batch, stopping each at its first hard
+    # failure since the pass/fail check only needs the valid flag
+    # (the validator takes plain dicts, so each proxy is copied at the top level)
+    results = validator.validate_policies((dict(test_case.policy) for test_case in TEST_CASES), fail_fast=True)
+    
+    # Each case's report is collected and written in one call
+    for i, (test_case, result) in enumerate(zip(TEST_CASES, results), 1):
+        lines = [f"Test {i}: {test_case.name}"]
         
         # Check if the result matches the expected outcome
-        if result["valid"] == test_case["expected_valid"]:
-            print("✅ PASSED")
+        if result["valid"] == test_case.expected_valid:
+            lines.append("✅ PASSED")
             passed += 1
         else:
-            print("❌ FAILED")
-            print(f"  Expected valid: {test_case['expected_valid']}")
-            print(f"  Actual valid: {result['valid']}")
+            lines.append("❌ FAILED")
+            lines.append(f"  Expected valid: {test_case.expected_valid}")
+            lines.append(f"  Actual valid: {result['valid']}")
             if result["issues"]:
-                print("  Issues found:")
-                for issue in result["issues"]:
-                    print(f"  - {issue}")
+                lines.append("  Issues found:")
+                lines.extend(f"  - {issue}" for issue in result["issues"])
             failed += 1
         
-        print()
+        lines.append("")
+        sys.stdout.write("\n".join(lines) + "\n")
     
     # Test with example policies from the example_policies directory
     if os.path.exists("example_policies"):
         print("=== Testing with example policies ===\n")
         
-        for filename in os.listdir("example_policies"):
-            if filename.endswith(".json"):
-                print(f"Testing {filename}")
-                
-                try:
-                    with open(os.path.join("example_policies", filename), 'r') as f:
-                        policy_data = json.load(f)
-                    
-                    # Extract the policy part
-                    if "policy" in policy_data:
-                        policy = policy_data["policy"]
-                    else:
-                        policy = policy_data
-                    
-                    # Validate the policy
-                    result = validator.validate_policy(policy)
-                    
-                    if result["valid"]:
-                        print("✅ Policy is valid according to best practices.")
-                        passed += 1
-                    else:
-                        print("⚠️ Policy has some issues:")
-                        for issue in result["issues"]:
-                            print(f"  - {issue}")
-                        failed += 1
-                    
-                    print()
-                
-                except Exception as e:
-                    print(f"❌ Error processing {filename}: {str(e)}")
+        # Validate the loaded policies in parallel; output stays in directory order
+        corpus = _example_corpus()
+        policies = [policy for _, policy, error in corpus if error is None]
+        chunks = [policies[i:i + 8] for i in range(0, len(policies), 8)]
+        
+        # Each worker builds its validator once, up front, and validates a
+        # chunk of policies per task
+        with ProcessPoolExecutor(initializer=_validator) as executor:
+            results = iter([result for chunk in executor.map(_validate_chunk, chunks) for result in chunk])
+        
+        for filename, _, error in corpus:
+            lines = [f"Testing {filename}"]
+            
+            if error is not None:
+                lines.append(f"❌ Error processing {filename}: {error}")
+                failed += 1
+            else:
+                result = next(results)
+                if result["valid"]:
+                    lines.append("✅ Policy is valid according to best practices.")
+                    passed += 1
+                else:
+                    lines.append("⚠️ Policy has some issues:")
+                    lines.extend(f"  - {issue}" for issue in result["issues"])
                     failed += 1
-                    print()
+            
+            lines.append("")
+            sys.stdout.write("\n".join(lines) + "\n")
     
     # Print summary
     print("=== Test Summary ===")
@@ -172,5 +288,88 @@ def test_validator():
     
     return passed, failed
 
+def test_policy_extraction():
+    """Test locating policy JSON in model output"""
+    print("=== Testing policy extraction ===\n")
+    
+    failures = []
+    for i, (name, text, expected) in enumerate(EXTRACTION_CASES, 1):
+        json_str, policy = extract_policy(text)
+        expected_policy = json_utils.loads(expected) if expected is not None else None
+        
+        lines = [f"Test {i}: {name}"]
+        if json_str == expected and policy == expected_policy:
+            lines.append("✅ PASSED")
+        else:
+            lines.append("❌ FAILED")
+            lines.append(f"  Expected: {expected}")
+            lines.append(f"  Actual: {json_str}")
+            failures.append(name)
+        
+        lines.append("")
+        sys.stdout.write("\n".join(lines) + "\n")
+    
+    # The individual helpers, directly
+    assert extract_fenced_json("```json\n{}") is None
+    assert extract_fenced_json("no fence") is None
+    assert extract_json_object('{"Version": "1", "Statement": [') is None
+    assert extract_json_object('"Version" {"Version": "1"}') == '{"Version": "1"}'
+    
+    assert not failures, f"Extraction cases failed: {', '.join(failures)}"
+
+def test_validator_cache():
+    """Test that cached validation results are independent copies"""
+    validator = PolicyValidator()
+    policy = dict(TEST_CASES[1].policy)
+    
+    # Mutating a returned result must not change what a later call returns
+    first = validator.validate_policy(policy)
+    expected = {key: list(value) if isinstance(value, list) else value for key, value in first.items()}
+    first["valid"] = True
+    first["issues"].append("mutated")
+    first["recommendations"].clear()
+    assert validator.validate_policy(policy) == expected
+    
+    # Key order doesn't change the canonical form, so equal policies share results
+    reordered = dict(reversed(list(policy.items())))
+    assert validator.validate_policy(reordered) == expected
+    
+    # Policies the canonical round-trip can't serialize are reported, not raised
+    unserializable = {"Version": "2012-10-17", "Statement": [{"Action": {"s3:GetObject"}, "Resource": "arn:aws:s3:::b/*"}]}
+    non_str_keys = {"Version": "2012-10-17", 1: "one", "Statement": []}
+    for bad_policy in (unserializable, non_str_keys):
+        result = validator.validate_policy(bad_policy)
+        assert result["valid"] is False
+        assert result["issues"][0].startswith("Validation error:")
+    
+    print("✅ Validator cache checks passed\n")
+
+def test_fail_fast():
+    """Test that fail_fast validation agrees with a full run on the valid flag"""
+    validator = PolicyValidator()
+    
+    policies = [dict(test_case.policy) for test_case in TEST_CASES]
+    policies += [policy for _, policy, error in _example_corpus() if error is None]
+    policies += [
+        # Several invalidating issues in one policy
+        {"Statement": [{"Action": ["*", "iam:*"], "Resource": "*"}, {"Action": "s3:GetObject"}]},
+        # Malformed statements and actions
+        {"Version": "2012-10-17", "Statement": ["x"]},
+        {"Version": "2012-10-17", "Statement": [{"Action": [["s3:*"]], "Resource": "arn:aws:s3:::b/*"}]},
+        {"Version": "2012-10-17"}
+    ]
+    
+    for policy in policies:
+        full = validator.validate_policy(policy)
+        fast = validator.validate_policy(policy, fail_fast=True)
+        assert fast["valid"] == full["valid"], policy
+        # A fail-fast run reports the leading issues of the full run, stopping early
+        assert full["issues"][:len(fast["issues"])] == fast["issues"], policy
+    
+    print("✅ fail_fast checks passed\n")
+
 if __name__ == "__main__":
+    test_policy_extraction()
+    test_validator_cache()
+    test_fail_fast()
     test_validator()
@@ -16,14 +16,134 @@ Usage:
 
 import os
 import sys
-import json
 import argparse
+import functools
+import json_utils
 from policy_utils import PolicyUtils
 from policy_validator import PolicyValidator
 
-def format_policy_json(policy_json):
-    """Format policy JSON for better readability"""
-    return json.dumps(policy_json, indent=2)
+def write_policy_json(policy_json):
+    """Write formatted policy JSON to stdout, as UTF-8 bytes when stdout has a buffer"""
+    data = json_utils.dumpb(policy_json, indent=True) + b"\n"
+    buffer = getattr(sys.stdout, "buffer", None)
+    if buffer is None:
+        # Text-only streams (e.g. a StringIO redirect) take a str
+        sys.stdout.write(data.decode("utf-8"))
+        return
+    
+    # Flush text already buffered by print so the output stays in order
+    sys.stdout.flush()
+    buffer.write(data)
+    buffer.flush()
+
+# Directories searched for a policy file, in order
+POLICY_DIRS = ("saved_policies", "example_policies")
+
+def _resolve(filename):
+    """Return the path of the first policy directory holding the file, or None"""
+    for directory in POLICY_DIRS:
+        path = os.path.join(directory, filename)
+        if os.path.isfile(path):
+            return path
+    return None
+
+def _load_any(filename):
+    """
+    Find a policy file and load it with a single read and parse.
+    
+    Args:
+        filename (str): Name of the policy file
+        
+    Returns:
+        dict: The loaded document, or None on error
+    """
+    # Find the file in saved_policies, then example_policies
+    path = _resolve(filename)
+    if path is None:
+        print(f"Error: Policy file '{filename}' not found.")
+        return None
+    
+    try:
+        with open(path, 'rb') as f:
+            policy_data = json_utils.loads(f.read())
+    
+    except Exception as e:
+        print(f"Error loading policy: {str(e)}")
+        policy_data = None
+    
+    if not policy_data:
+        print(f"Error: Could not load policy '{filename}'.")
+        return None
+    return policy_data
+
+@functools.lru_cache(maxsize=1)
+def _validator():
+    """Return the shared policy validator"""
+    return PolicyValidator()
+
+def cmd_list(args, policy_utils, policy_validator):
+    """List all saved policies"""
+    policies = policy_utils.list_saved_policies()
+    
+    if not policies:
+        print("No saved policies found.")
+        return
+    
+    print(f"Found {len(policies)} saved policies:")
+    for i, policy in enumerate(policies, 1):
+        print(f"{i}. {policy}")
+
+def cmd_view(args, policy_utils, policy_validator):
+    """Show a policy's metadata and content"""
+    policy_data = _load_any(args.filename)
+    if policy_data is None:
+        return
+    
+    # Display policy metadata
+    print("\n=== Policy Metadata ===")
+    if "metadata" in policy_data:
+        for key, value in policy_data["metadata"].items():
+            print(f"{key}: {value}")
+    
+    # Display policy content
+    print("\n=== Policy Content ===")
+    if "policy" in policy_data:
+        write_policy_json(policy_data["policy"])
+    else:
+        write_policy_json(policy_data)
+
+def cmd_validate(args, policy_utils, policy_validator):
+    """Validate a policy against best practices"""
+    policy_data = _load_any(args.filename)
+    if policy_data is None:
+        return
+    
+    # Extract the policy part
+    if "policy" in policy_data:
+        policy = policy_data["policy"]
+    else:
+        policy = policy_data
+    
+    # Validate the policy
+    validation_results = policy_validator.validate_policy(policy)
+    
+    # Display validation results
+    print("\n=== Policy Validation Results ===")
+    
+    if validation_results["valid"]:
+        print("✅ Policy is valid according to best practices.")
+    else:
+        print("⚠️ Policy has some issues to address:")
+    
+    if validation_results["issues"]:
+        print("\nIssues:")
+        for issue in validation_results["issues"]:
+            print(f"- {issue}")
+    
+    if validation_results["recommendations"]:
+        print("\nRecommendations:")
+        for rec in validation_results["recommendations"]:
+            print(f"- {rec}")
 
 def main():
     parser = argparse.ArgumentParser(description="View and analyze saved IAM policies")
@@ -31,109 +151,27 @@ def main():
     
     # List command
     list_parser = subparsers.add_parser("list", help="List all saved policies")
+    list_parser.set_defaults(func=cmd_list)
     
     # View command
     view_parser = subparsers.add_parser("view", help="View a specific policy")
     view_parser.add_argument("filename", help="Policy filename to view")
+    view_parser.set_defaults(func=cmd_view)
     
     # Validate command
     validate_parser = subparsers.add_parser("validate", help="Validate a policy against best practices")
     validate_parser.add_argument("filename", help="Policy filename to validate")
+    validate_parser.set_defaults(func=cmd_validate)
     
     args = parser.parse_args()
     
-    # Initialize utilities
-    policy_utils = PolicyUtils()
-    policy_validator = PolicyValidator()
-    
-    # Handle commands
-    if args.command == "list":
-        policies = policy_utils.list_saved_policies()
-        
-        if not policies:
-            print("No saved policies found.")
-            return
-        
-        print(f"Found {len(policies)} saved policies:")
-        for i, policy in enumerate(policies, 1):
-            print(f"{i}. {policy}")
-    
-    elif args.command == "view":
-        # Check if the file exists in saved_policies directory
-        if not os.path.exists(os.path.join("saved_policies", args.filename)):
-            # Check if it exists in example_policies directory
-            if os.path.exists(os.path.join("example_policies", args.filename)):
-                with open(os.path.join("example_policies", args.filename), 'r') as f:
-                    policy_data = json.load(f)
-            else:
-                print(f"Error: Policy file '{args.filename}' not found.")
-                return
-        else:
-            policy_data = policy_utils.load_policy(args.filename)
-        
-        if not policy_data:
-            print(f"Error: Could not load policy '{args.filename}'.")
-            return
-        
-        # Display policy metadata
-        print("\n=== Policy Metadata ===")
-        if "metadata" in policy_data:
-            for key, value in policy_data["metadata"].items():
-                print(f"{key}: {value}")
-        
-        # Display policy content
-        print("\n=== Policy Content ===")
-        if "policy" in policy_data:
-            print(format_policy_json(policy_data["policy"]))
-        else:
-            print(format_policy_json(policy_data))
-    
-    elif args.command == "validate":
-        # Check if the file exists in saved_policies directory
-        if not os.path.exists(os.path.join("saved_policies", args.filename)):
-            # Check if it exists in example_policies directory
-            if os.path.exists(os.path.join("example_policies", args.filename)):
-                with open(os.path.join("example_policies", args.filename), 'r') as f:
-                    policy_data = json.load(f)
-            else:
-                print(f"Error: Policy file '{args.filename}' not found.")
-                return
-        else:
-            policy_data = policy_utils.load_policy(args.filename)
-        
-        if not policy_data:
-            print(f"Error: Could not load policy '{args.filename}'.")
-            return
-        
-        # Extract the policy part
-        if "policy" in policy_data:
-            policy = policy_data["policy"]
-        else:
-            policy = policy_data
-        
-        # Validate the policy
-        validation_results = policy_validator.validate_policy(policy)
-        
-        # Display validation results
-        print("\n=== Policy Validation Results ===")
-        
-        if validation_results["valid"]:
-            print("✅ Policy is valid according to best practices.")
-        else:
-            print("⚠️ Policy has some issues to address:")
-        
-        if validation_results["issues"]:
-            print("\nIssues:")
-            for issue in validation_results["issues"]:
-                print(f"- {issue}")
-        
-        if validation_results["recommendations"]:
-            print("\nRecommendations:")
-            for rec in validation_results["recommendations"]:
-                print(f"- {rec}")
-    
-    else:
+    if not hasattr(args, "func"):
         parser.print_help()
+        return
+    
+    # Initialize utilities and run the command
+    policy_utils = PolicyUtils()
+    args.func(args, policy_utils, _validator())
 
 if __name__ == "__main__":
     main()